@@ -5,7 +5,7 @@ MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
@@ -21,12 +21,41 @@ db = None
 database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
-if database_url and database_name:
-    _client = MongoClient(database_url)
-    db = _client[database_name]
+# Each uvicorn worker has its own client, so pool sizes are split across
+# WEB_CONCURRENCY workers: at most 100 connections and up to 10 kept warm
+# for the whole server. Each worker needs at least one connection
+# (maxPoolSize=0 would mean unlimited), so past 100 workers the bound is
+# one connection per worker.
+_workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+POOL_OPTIONS = {
+    "maxPoolSize": max(1, 100 // _workers),
+    "minPoolSize": 10 // _workers,
+    "maxIdleTimeMS": 30000,
+    "serverSelectionTimeoutMS": 3000,
+    "waitQueueTimeoutMS": 2000,
+}
+
+
+def connect():
+    """Create this process's client and connection pool on first call"""
+    global _client, db
+    if _client is None and database_url and database_name:
+        _client = AsyncIOMotorClient(database_url, **POOL_OPTIONS)
+        db = _client[database_name]
+    return db
+
+
+def close():
+    """Close this process's client, if one was created"""
+    global _client, db
+    if _client is not None:
+        _client.close()
+    _client = None
+    db = None
+
 
 # Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
+async def create_document(collection_name: str, data: Union[BaseModel, dict]):
     """Insert a single document with timestamp"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
@@ -37,13 +66,14 @@ def create_document(collection_name: str, data: Union[BaseModel, dict]):
     else:
         data_dict = data.copy()
 
-    data_dict['created_at'] = datetime.now(timezone.utc)
-    data_dict['updated_at'] = datetime.now(timezone.utc)
+    now = datetime.now(timezone.utc)
+    data_dict['created_at'] = now
+    data_dict['updated_at'] = now
 
-    result = db[collection_name].insert_one(data_dict)
+    result = await db[collection_name].insert_one(data_dict)
     return str(result.inserted_id)
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
+async def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
     """Get documents from collection"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
@@ -52,4 +82,4 @@ def get_documents(collection_name: str, filter_dict: dict = None, limit: int = N
     if limit:
         cursor = cursor.limit(limit)
     
-    return list(cursor)
+    return await cursor.to_list(length=None)
@@ -1,25 +1,40 @@
+import asyncio
+import logging
 import os
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi import Depends, FastAPI, HTTPException, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel
 import jwt
+import orjson
 from bson import ObjectId
+from pymongo import UpdateOne
 
-from database import db, create_document, get_documents
+import database
+from database import create_document, get_documents
 from schemas import MenuItem, Reservation, Order, Review
 
 
 JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret-change-me")
 JWT_ALGO = "HS256"
+_JWT_KEY = JWT_SECRET.encode()
+_JWT_DECODE_OPTIONS = {"verify_signature": True, "require": ["exp"], "verify_aud": False, "verify_iss": False}
 ADMIN_EMAIL = os.getenv("ADMIN_EMAIL", "admin@kokumandcoast.in")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin123")
+JWT_TTL_SECONDS = 8 * 3600
+MENU_CACHE_TTL = 60
+REVIEWS_CACHE_TTL = 120
 
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Kokum & Coast API")
+
+app = FastAPI(title="Kokum & Coast API", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +43,85 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Level 1 gets most of the win on repetitive JSON for very little CPU
+app.add_middleware(GZipMiddleware, minimum_size=512, compresslevel=1)
+
+# Set per worker process on startup so each worker owns its own connection pool.
+db = None
+
+MENU_CATEGORY_INDEX = [("category", 1), ("name", 1)]
+MENU_PROJECTION = {f: 1 for f in MenuItem.model_fields}
+REVIEW_PROJECTION = {**{f: 1 for f in Review.model_fields}, "created_at": 1}
+ANALYTICS_BACKFILL_MARKER = {"_id": "analytics_backfilled"}
+
+
+_setup_task: Optional[asyncio.Task] = None
+
+
+@app.on_event("startup")
+async def connect_db():
+    global db, _setup_task
+    db = database.connect()
+    if db is not None:
+        # In the background so a slow or unreachable database can't stop the app booting
+        _setup_task = asyncio.create_task(setup_db())
+
+
+async def setup_db():
+    # Every worker runs this: create_index is a no-op when the index already exists
+    try:
+        await db["menuitem"].create_index(MENU_CATEGORY_INDEX)
+        await db["reservation"].create_index([("created_at", -1)])
+        await db["order"].create_index([("created_at", -1)])
+        await db["review"].create_index([("created_at", -1)])
+        await db["analytics_items"].create_index([("qty", -1)])
+        await backfill_analytics()
+    except Exception:
+        logger.exception("Database setup failed; it will be retried on the next startup")
+
+
+async def backfill_analytics():
+    """Build the analytics rollups from existing orders, once.
+
+    Completion is recorded in _meta rather than inferred from the rollup
+    collections, because create_order starts filling those as soon as the
+    app is up. Only exact when no orders are being written while it runs:
+    the $merge replaces rollup documents wholesale, so increments from
+    create_order racing the scan can be lost or double counted.
+    """
+    if await db["_meta"].find_one(ANALYTICS_BACKFILL_MARKER) is not None:
+        return
+    await rebuild_analytics()
+
+
+async def rebuild_analytics():
+    """Recompute the rollups from the order collection and record the backfill marker.
+
+    Also the repair path when create_order failed to update the rollups:
+    see POST /api/analytics/rebuild.
+    """
+    # $merge with replace makes this idempotent if several workers run it at once
+    await db["order"].aggregate([
+        {"$unwind": "$items"},
+        {"$group": {"_id": "$items.name", "qty": {"$sum": "$items.qty"}}},
+        {"$merge": {"into": "analytics_items", "whenMatched": "replace"}},
+    ]).to_list(length=None)
+    await db["order"].aggregate([
+        {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}, "count": {"$sum": 1}}},
+        {"$merge": {"into": "analytics_daily", "whenMatched": "replace"}},
+    ]).to_list(length=None)
+    await db["_meta"].update_one(
+        ANALYTICS_BACKFILL_MARKER, {"$set": {"completed_at": datetime.now(timezone.utc)}}, upsert=True
+    )
+
+
+@app.on_event("shutdown")
+async def close_db():
+    global db
+    if _setup_task is not None and not _setup_task.done():
+        _setup_task.cancel()
+    database.close()
+    db = None
 
 
 # ---------- Helpers ----------
@@ -42,40 +136,120 @@ def oid(obj: Any) -> str:
     return str(obj)
 
 
+def parse_oid(value: str) -> ObjectId:
+    """Parse a path id, rejecting malformed ones with a 404 before querying Mongo"""
+    if not ObjectId.is_valid(value):
+        raise HTTPException(404, "Not found")
+    return ObjectId(value)
+
+
 def serialize_doc(doc: Dict) -> Dict:
-    if not doc:
-        return doc
-    out = {**doc}
-    if "_id" in out:
-        out["id"] = oid(out.pop("_id"))
-    # convert datetimes
-    for k, v in list(out.items()):
-        if isinstance(v, (datetime,)):
-            out[k] = v.isoformat()
-    return out
+    # Mutates in place: cursors hand back a fresh dict per document.
+    # datetimes are left for orjson, which encodes them natively.
+    if doc and "_id" in doc:
+        doc["id"] = oid(doc.pop("_id"))
+    return doc
+
+
+def _orjson_default(obj: Any) -> str:
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError
+
+
+def dump_docs(docs: List[Dict]) -> bytes:
+    """Encode Mongo documents straight to JSON bytes (naive datetimes are UTC)"""
+    return orjson.dumps([serialize_doc(d) for d in docs], default=_orjson_default, option=orjson.OPT_NAIVE_UTC)
+
+
+def _dump_doc(doc: Dict) -> bytes:
+    return orjson.dumps(serialize_doc(doc), default=_orjson_default, option=orjson.OPT_NAIVE_UTC)
+
+
+async def stream_docs(cursor) -> Response:
+    """Stream a cursor as a JSON array one document at a time.
+
+    The first document is fetched before any headers go out, so a failing
+    query still surfaces as an error status rather than a truncated 200.
+    """
+    try:
+        first = await cursor.next()
+    except StopAsyncIteration:
+        return Response(b"[]", media_type="application/json")
+
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            yield b"[" + _dump_doc(first)
+            async for doc in cursor:
+                yield b"," + _dump_doc(doc)
+            yield b"]"
+        finally:
+            # also runs on client disconnect, so the server-side cursor isn't left open
+            await cursor.close()
+
+    return StreamingResponse(body(), media_type="application/json")
+
+
+# In-process cache of encoded public GET responses: key -> (expires_at, body).
+# Each worker keeps its own copy, so writes only invalidate the worker that
+# handled them; the short TTLs bound staleness elsewhere.
+_response_cache: Dict[str, Tuple[float, bytes]] = {}
+_RESPONSE_CACHE_MAX = 256
+
+
+def cache_get(key: str) -> Optional[bytes]:
+    hit = _response_cache.get(key)
+    if hit is None or hit[0] < time.monotonic():
+        return None
+    return hit[1]
+
+
+def cache_set(key: str, body: bytes, ttl: float) -> bytes:
+    if len(_response_cache) >= _RESPONSE_CACHE_MAX:
+        _response_cache.clear()
+    _response_cache[key] = (time.monotonic() + ttl, body)
+    return body
+
+
+def cache_drop(prefix: str) -> None:
+    for key in [k for k in _response_cache if k.startswith(prefix)]:
+        del _response_cache[key]
 
 
 def create_jwt(email: str) -> str:
+    now = int(time.time())
     payload = {
         "sub": email,
-        "exp": datetime.now(timezone.utc) + timedelta(hours=8),
-        "iat": datetime.now(timezone.utc),
+        "exp": now + JWT_TTL_SECONDS,
+        "iat": now,
         "role": "admin",
     }
-    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGO)
+    return jwt.encode(payload, _JWT_KEY, algorithm=JWT_ALGO)
 
 
 bearer = HTTPBearer(auto_error=False)
 
+# Verified admin tokens: raw token -> (payload, exp), so repeat calls skip jwt.decode.
+_token_cache: Dict[str, Tuple[Dict, float]] = {}
+_TOKEN_CACHE_MAX = 4096
+
 
-def require_admin(creds: Optional[HTTPAuthorizationCredentials] = Depends(bearer)):
+async def require_admin(creds: Optional[HTTPAuthorizationCredentials] = Depends(bearer)):
     if creds is None:
         raise HTTPException(status_code=401, detail="Missing credentials")
     token = creds.credentials
+    hit = _token_cache.get(token)
+    if hit is not None:
+        if hit[1] > time.time():
+            return hit[0]
+        del _token_cache[token]
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
+        payload = jwt.decode(token, _JWT_KEY, algorithms=[JWT_ALGO], options=_JWT_DECODE_OPTIONS)
         if payload.get("role") != "admin":
             raise HTTPException(status_code=403, detail="Forbidden")
+        if len(_token_cache) >= _TOKEN_CACHE_MAX:
+            del _token_cache[next(iter(_token_cache))]
+        _token_cache[token] = (payload, float(payload["exp"]))
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
@@ -85,32 +259,35 @@ def require_admin(creds: Optional[HTTPAuthorizationCredentials] = Depends(bearer
 
 # ---------- Basic & Info ----------
 @app.get("/")
-def root():
-    return {"message": "Kokum & Coast API running"}
+async def root():
+    return ORJSONResponse({"message": "Kokum & Coast API running"})
+
+
+_INFO_BYTES = orjson.dumps({
+    "name": "Kokum & Coast – Coastal Maharashtra, Reimagined",
+    "address": "Shop No. 12, Colaba Causeway, Colaba, Mumbai 400005",
+    "phone": "+91-22-4000-1234",
+    "email": "hello@kokumandcoast.in",
+    "hours": {
+        "mon": "11:00–23:00",
+        "tue": "11:00–23:00",
+        "wed": "11:00–23:00",
+        "thu": "11:00–23:00",
+        "fri": "11:00–23:30",
+        "sat": "09:00–23:30",
+        "sun": "09:00–22:30",
+    },
+    "socials": {
+        "instagram": "https://instagram.com/kokumandcoast",
+        "facebook": "https://facebook.com/kokumandcoast",
+        "twitter": "https://twitter.com/kokumandcoast",
+    },
+})
 
 
 @app.get("/api/info")
-def get_info():
-    return {
-        "name": "Kokum & Coast – Coastal Maharashtra, Reimagined",
-        "address": "Shop No. 12, Colaba Causeway, Colaba, Mumbai 400005",
-        "phone": "+91-22-4000-1234",
-        "email": "hello@kokumandcoast.in",
-        "hours": {
-            "mon": "11:00–23:00",
-            "tue": "11:00–23:00",
-            "wed": "11:00–23:00",
-            "thu": "11:00–23:00",
-            "fri": "11:00–23:30",
-            "sat": "09:00–23:30",
-            "sun": "09:00–22:30",
-        },
-        "socials": {
-            "instagram": "https://instagram.com/kokumandcoast",
-            "facebook": "https://facebook.com/kokumandcoast",
-            "twitter": "https://twitter.com/kokumandcoast",
-        },
-    }
+async def get_info():
+    return Response(_INFO_BYTES, media_type="application/json", headers={"Cache-Control": "public, max-age=3600"})
 
 
 # ---------- Auth ----------
@@ -120,65 +297,79 @@ class LoginRequest(BaseModel):
 
 
 @app.post("/api/auth/login", response_model=TokenResponse)
-def login(req: LoginRequest):
+async def login(req: LoginRequest):
     if req.email.lower() == ADMIN_EMAIL.lower() and req.password == ADMIN_PASSWORD:
         token = create_jwt(req.email)
-        return TokenResponse(access_token=token)
+        return ORJSONResponse(TokenResponse(access_token=token).model_dump())
     raise HTTPException(status_code=401, detail="Invalid credentials")
 
 
 # ---------- Menu ----------
 @app.get("/api/menu")
-def list_menu(category: Optional[str] = None):
+async def list_menu(category: Optional[str] = None):
     query: Dict = {}
     if category:
         query["category"] = category
-    items = db["menuitem"].find(query).sort("name", 1)
-    return [serialize_doc(i) for i in items]
+    key = f"/api/menu?category={category or ''}"
+    body = cache_get(key)
+    if body is None:
+        # the planner picks the (category, name) index for this filter + sort on its own
+        cursor = db["menuitem"].find(query, projection=MENU_PROJECTION).sort("name", 1).batch_size(100)
+        items = await cursor.to_list(length=None)
+        body = cache_set(key, dump_docs(items), MENU_CACHE_TTL)
+    return Response(body, media_type="application/json")
 
 
 @app.post("/api/menu", dependencies=[Depends(require_admin)])
-def create_menu_item(item: MenuItem):
-    _id = db["menuitem"].insert_one({**item.model_dump(), "created_at": datetime.now(timezone.utc)}).inserted_id
-    return {"id": oid(_id)}
+async def create_menu_item(item: MenuItem):
+    now = datetime.now(timezone.utc)
+    _id = (await db["menuitem"].insert_one({**item.model_dump(), "created_at": now})).inserted_id
+    cache_drop("/api/menu")
+    return ORJSONResponse({"id": oid(_id)})
 
 
 @app.delete("/api/menu/{item_id}", dependencies=[Depends(require_admin)])
-def delete_menu_item(item_id: str):
-    res = db["menuitem"].delete_one({"_id": ObjectId(item_id)})
+async def delete_menu_item(item_id: str):
+    res = await db["menuitem"].delete_one({"_id": parse_oid(item_id)})
     if res.deleted_count == 0:
         raise HTTPException(404, "Not found")
-    return {"ok": True}
+    cache_drop("/api/menu")
+    return ORJSONResponse({"ok": True})
+
+
+MENU_SEED = [
+    {"name": "Goan Prawn Croquette", "category": "Starters", "description": "Crisp prawn bites with kokum aioli", "price": 420, "veg": False, "spicy_level": 2, "tags": ["goan", "prawn"]},
+    {"name": "Kokum Fish Curry", "category": "Mains", "description": "Tangy kokum-based curry, fresh catch of the day", "price": 590, "veg": False, "spicy_level": 3, "tags": ["kokum", "malvani"]},
+    {"name": "Mumbai Biryani", "category": "Mains", "description": "City-style fragrant biryani with raita", "price": 520, "veg": False, "spicy_level": 2, "tags": ["biryani"]},
+    {"name": "Sol Kadhi", "category": "Beverages", "description": "Refreshing kokum-coconut cooler", "price": 180, "veg": True, "spicy_level": 0, "tags": ["kokum", "refresh"]},
+    {"name": "Puran Poli", "category": "Desserts", "description": "Classic sweet flatbread with ghee", "price": 260, "veg": True, "spicy_level": 0, "tags": ["maharashtrian"]},
+    {"name": "Masala Chai", "category": "Beverages", "description": "Spiced tea the Mumbai way", "price": 120, "veg": True, "spicy_level": 0, "tags": ["chai"]},
+]
 
 
 @app.post("/api/menu/seed", dependencies=[Depends(require_admin)])
-def seed_menu():
-    if db["menuitem"].count_documents({}) > 0:
-        return {"message": "Menu already seeded"}
-    sample = [
-        {"name": "Goan Prawn Croquette", "category": "Starters", "description": "Crisp prawn bites with kokum aioli", "price": 420, "veg": False, "spicy_level": 2, "tags": ["goan", "prawn"]},
-        {"name": "Kokum Fish Curry", "category": "Mains", "description": "Tangy kokum-based curry, fresh catch of the day", "price": 590, "veg": False, "spicy_level": 3, "tags": ["kokum", "malvani"]},
-        {"name": "Mumbai Biryani", "category": "Mains", "description": "City-style fragrant biryani with raita", "price": 520, "veg": False, "spicy_level": 2, "tags": ["biryani"]},
-        {"name": "Sol Kadhi", "category": "Beverages", "description": "Refreshing kokum-coconut cooler", "price": 180, "veg": True, "spicy_level": 0, "tags": ["kokum", "refresh"]},
-        {"name": "Puran Poli", "category": "Desserts", "description": "Classic sweet flatbread with ghee", "price": 260, "veg": True, "spicy_level": 0, "tags": ["maharashtrian"]},
-        {"name": "Masala Chai", "category": "Beverages", "description": "Spiced tea the Mumbai way", "price": 120, "veg": True, "spicy_level": 0, "tags": ["chai"]},
-    ]
-    for it in sample:
-        db["menuitem"].insert_one({**it, "created_at": datetime.now(timezone.utc)})
-    return {"inserted": len(sample)}
+async def seed_menu():
+    if await db["menuitem"].count_documents({}) > 0:
+        return ORJSONResponse({"message": "Menu already seeded"})
+    now = datetime.now(timezone.utc)
+    docs = [{**it, "created_at": now} for it in MENU_SEED]
+    await db["menuitem"].insert_many(docs, ordered=False)
+    cache_drop("/api/menu")
+    return ORJSONResponse({"inserted": len(docs)})
 
 
 # ---------- Reservations ----------
 @app.post("/api/reservations")
-def create_reservation(data: Reservation):
-    _id = db["reservation"].insert_one({**data.model_dump(), "created_at": datetime.now(timezone.utc), "updated_at": datetime.now(timezone.utc)}).inserted_id
-    return {"id": oid(_id), "status": "pending"}
+async def create_reservation(data: Reservation):
+    now = datetime.now(timezone.utc)
+    _id = (await db["reservation"].insert_one({**data.model_dump(), "created_at": now, "updated_at": now})).inserted_id
+    return ORJSONResponse({"id": oid(_id), "status": "pending"})
 
 
 @app.get("/api/reservations", dependencies=[Depends(require_admin)])
-def list_reservations(limit: int = 100):
-    rows = db["reservation"].find({}).sort("created_at", -1).limit(limit)
-    return [serialize_doc(r) for r in rows]
+async def list_reservations(limit: int = 100):
+    rows = db["reservation"].find({}).sort("created_at", -1).limit(limit).batch_size(100)
+    return await stream_docs(rows)
 
 
 class ReservationStatus(BaseModel):
@@ -186,25 +377,41 @@ class ReservationStatus(BaseModel):
 
 
 @app.patch("/api/reservations/{res_id}", dependencies=[Depends(require_admin)])
-def update_reservation_status(res_id: str, body: ReservationStatus):
-    res = db["reservation"].update_one({"_id": ObjectId(res_id)}, {"$set": {"status": body.status, "updated_at": datetime.now(timezone.utc)}})
+async def update_reservation_status(res_id: str, body: ReservationStatus):
+    res = await db["reservation"].update_one({"_id": parse_oid(res_id)}, {"$set": {"status": body.status, "updated_at": datetime.now(timezone.utc)}})
     if res.matched_count == 0:
         raise HTTPException(404, "Not found")
-    return {"ok": True}
+    return ORJSONResponse({"ok": True})
 
 
 # ---------- Orders ----------
+async def record_order_rollups(order: Order, now: datetime) -> None:
+    """Best-effort update of the /api/analytics rollups; the order is already saved"""
+    writes = [db["analytics_daily"].update_one({"_id": now.strftime("%Y-%m-%d")}, {"$inc": {"count": 1}}, upsert=True)]
+    if order.items:
+        writes.append(db["analytics_items"].bulk_write(
+            [UpdateOne({"_id": it.name}, {"$inc": {"qty": it.qty}}, upsert=True) for it in order.items],
+            ordered=False,
+        ))
+    try:
+        await asyncio.gather(*writes)
+    except Exception:
+        logger.exception("Failed to update analytics rollups for order; POST /api/analytics/rebuild to reconcile")
+
+
 @app.post("/api/orders")
-def create_order(order: Order):
-    payload = {**order.model_dump(), "created_at": datetime.now(timezone.utc), "updated_at": datetime.now(timezone.utc)}
-    _id = db["order"].insert_one(payload).inserted_id
-    return {"id": oid(_id), "status": order.status}
+async def create_order(order: Order):
+    now = datetime.now(timezone.utc)
+    payload = {**order.model_dump(), "created_at": now, "updated_at": now}
+    _id = (await db["order"].insert_one(payload)).inserted_id
+    await record_order_rollups(order, now)
+    return ORJSONResponse({"id": oid(_id), "status": order.status})
 
 
 @app.get("/api/orders", dependencies=[Depends(require_admin)])
-def list_orders(limit: int = 100):
-    rows = db["order"].find({}).sort("created_at", -1).limit(limit)
-    return [serialize_doc(r) for r in rows]
+async def list_orders(limit: int = 100):
+    rows = db["order"].find({}).sort("created_at", -1).limit(limit).batch_size(100)
+    return await stream_docs(rows)
 
 
 class OrderStatus(BaseModel):
@@ -213,64 +420,80 @@ class OrderStatus(BaseModel):
 
 
 @app.patch("/api/orders/{order_id}", dependencies=[Depends(require_admin)])
-def update_order_status(order_id: str, body: OrderStatus):
+async def update_order_status(order_id: str, body: OrderStatus):
     update: Dict[str, Any] = {"status": body.status}
     if body.payment_status:
         update["payment_status"] = body.payment_status
-    res = db["order"].update_one({"_id": ObjectId(order_id)}, {"$set": update})
+    res = await db["order"].update_one({"_id": parse_oid(order_id)}, {"$set": update})
     if res.matched_count == 0:
         raise HTTPException(404, "Not found")
-    return {"ok": True}
+    return ORJSONResponse({"ok": True})
 
 
 # ---------- Reviews (public read, admin seed) ----------
 @app.get("/api/reviews")
-def get_reviews():
-    rows = db["review"].find({}).sort("created_at", -1).limit(20)
-    return [serialize_doc(r) for r in rows]
+async def get_reviews():
+    body = cache_get("/api/reviews")
+    if body is None:
+        rows = await db["review"].find({}, projection=REVIEW_PROJECTION).sort("created_at", -1).limit(20).to_list(length=None)
+        body = cache_set("/api/reviews", dump_docs(rows), REVIEWS_CACHE_TTL)
+    return Response(body, media_type="application/json")
+
+
+REVIEW_SEED = [
+    {"name": "Aarav", "rating": 5, "comment": "Sensational kokum fish curry and the Sol Kadhi was a perfect finish.", "city": "Mumbai"},
+    {"name": "Meera", "rating": 5, "comment": "Warm hospitality, refined flavours, and gorgeous interiors.", "city": "Pune"},
+    {"name": "Zahir", "rating": 4, "comment": "Goan prawn croquettes are a must-try. Will be back!", "city": "Mumbai"},
+]
 
 
 @app.post("/api/reviews/seed", dependencies=[Depends(require_admin)])
-def seed_reviews():
-    if db["review"].count_documents({}) > 0:
-        return {"message": "Reviews already exist"}
-    sample = [
-        {"name": "Aarav", "rating": 5, "comment": "Sensational kokum fish curry and the Sol Kadhi was a perfect finish.", "city": "Mumbai"},
-        {"name": "Meera", "rating": 5, "comment": "Warm hospitality, refined flavours, and gorgeous interiors.", "city": "Pune"},
-        {"name": "Zahir", "rating": 4, "comment": "Goan prawn croquettes are a must-try. Will be back!", "city": "Mumbai"},
-    ]
-    for r in sample:
-        db["review"].insert_one({**r, "created_at": datetime.now(timezone.utc)})
-    return {"inserted": len(sample)}
+async def seed_reviews():
+    if await db["review"].count_documents({}) > 0:
+        return ORJSONResponse({"message": "Reviews already exist"})
+    now = datetime.now(timezone.utc)
+    docs = [{**r, "created_at": now} for r in REVIEW_SEED]
+    await db["review"].insert_many(docs, ordered=False)
+    cache_drop("/api/reviews")
+    return ORJSONResponse({"inserted": len(docs)})
 
 
 # ---------- Analytics (admin) ----------
 @app.get("/api/analytics", dependencies=[Depends(require_admin)])
-def analytics():
-    # top items by quantity
-    pipeline = [
-        {"$unwind": "$items"},
-        {"$group": {"_id": "$items.name", "qty": {"$sum": "$items.qty"}}},
-        {"$sort": {"qty": -1}},
-        {"$limit": 5},
-    ]
-    top_items = list(db["order"].aggregate(pipeline))
+async def analytics():
+    # top items by quantity, from the rollup maintained by create_order
+    top_items = await db["analytics_items"].find({}).sort("qty", -1).limit(5).to_list(5)
     for t in top_items:
         t["name"] = t.pop("_id")
-    # daily orders last 7 days
+    # daily orders last 7 days; bucket ids are YYYY-MM-DD so they sort as dates
     now = datetime.now(timezone.utc)
-    start = now - timedelta(days=7)
-    daily = list(db["order"].aggregate([
-        {"$match": {"created_at": {"$gte": start}}},
-        {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}, "count": {"$sum": 1}}},
-        {"$sort": {"_id": 1}},
-    ]))
-    return {"top_items": top_items, "daily_orders": daily}
+    start = (now - timedelta(days=7)).strftime("%Y-%m-%d")
+    daily = await db["analytics_daily"].find({"_id": {"$gte": start}}).sort("_id", 1).to_list(length=None)
+    return ORJSONResponse({"top_items": top_items, "daily_orders": daily})
+
+
+@app.post("/api/analytics/rebuild", dependencies=[Depends(require_admin)])
+async def rebuild_analytics_rollups():
+    await rebuild_analytics()
+    return ORJSONResponse({"ok": True})
 
 
 # ---------- Utility ----------
+COLLECTIONS_CACHE_TTL = 30
+_collections_cache: Tuple[float, List[str]] = (0.0, [])
+
+
+async def cached_collection_names() -> List[str]:
+    global _collections_cache
+    fetched_at, names = _collections_cache
+    if time.monotonic() - fetched_at >= COLLECTIONS_CACHE_TTL:
+        names = await db.list_collection_names()
+        _collections_cache = (time.monotonic(), names)
+    return names
+
+
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -287,7 +510,7 @@ def test_database():
             response["database_name"] = db.name if hasattr(db, 'name') else "✅ Connected"
             response["connection_status"] = "Connected"
             try:
-                collections = db.list_collection_names()
+                collections = await cached_collection_names()
                 response["collections"] = collections[:10]
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
@@ -297,12 +520,17 @@ def test_database():
     except Exception as e:
         response["database"] = f"❌ Error: {str(e)[:50]}"
 
-    response["database_url"] = "✅ Set" if os.getenv("DATABASE_URL") else "❌ Not Set"
-    response["database_name"] = "✅ Set" if os.getenv("DATABASE_NAME") else "❌ Not Set"
-    return response
+    response["database_url"] = "✅ Set" if database.database_url else "❌ Not Set"
+    response["database_name"] = "✅ Set" if database.database_name else "❌ Not Set"
+    return ORJSONResponse(response)
 
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # os.cpu_count() reports host CPUs inside containers, so cap the default
+    default_workers = min((os.cpu_count() or 1) * 2 + 1, int(os.getenv("MAX_WORKERS", 8)))
+    workers = int(os.getenv("WEB_CONCURRENCY", default_workers))
+    # workers inherit this, so database.py can size each pool's share
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers, loop="uvloop", http="httptools")